@@ -1,9 +1,12 @@
 #!/usr/bin/env node
 /* eslint-disable no-console */
+const crypto = require("crypto");
 const fs = require("fs");
 const path = require("path");
 const os = require("os");
-const { spawn } = require("child_process");
+const readline = require("readline");
+const { spawn, fork } = require("child_process");
+const { Worker, isMainThread, parentPort } = require("worker_threads");
 
 const THRESHOLDS = {
   LCP: { good: 2500, ni: 4000 },
@@ -14,17 +17,49 @@ const THRESHOLDS = {
   TTFB: { good: 800, ni: 1800 },
 };
 
+// Hoisted so hot paths (per run / per CSV cell) reuse one RegExp object each.
+const RE_URL_SCHEME = /^https?:\/\//;
+const RE_URL_SEPARATORS = /[/:?&=#]+/g;
+const RE_DOUBLE_QUOTE = /"/g;
+const RE_PIPE = /\|/g;
+
+// Screenshot payloads are base64 images and make up most of an LHR's bytes, yet
+// extractMetrics never reads them and they do not affect the performance score.
+const SKIPPED_AUDITS = ["screenshot-thumbnails", "final-screenshot"];
+
+const GRADE_LABELS = ["GOOD", "NI", "POOR"];
+// Per metric, ascending inclusive upper bounds for GOOD and NI; built once.
+const GRADE_TABLES = Object.fromEntries(
+  Object.entries(THRESHOLDS).map(([metric, t]) => [metric, [t.good, t.ni]]),
+);
+
 function grade(metric, value) {
   if (value === null || value === undefined) return "N/A";
-  const t = THRESHOLDS[metric];
-  if (!t) return "N/A";
-  if (value <= t.good) return "GOOD";
-  if (value <= t.ni) return "NI";
-  return "POOR";
+  const bounds = GRADE_TABLES[metric];
+  if (!bounds) return "N/A";
+  // Count the bounds the value exceeds; `!(<=)` keeps NaN grading as POOR.
+  let i = 0;
+  while (i < bounds.length && !(value <= bounds[i])) i += 1;
+  return GRADE_LABELS[i];
+}
+
+// Grade every THRESHOLDS metric; metrics objects use the lower-cased keys.
+function gradeAll(metrics) {
+  const grades = {};
+  for (const metric of Object.keys(GRADE_TABLES)) {
+    grades[metric] = grade(metric, metrics[metric.toLowerCase()]);
+  }
+  return grades;
+}
+
+// Float64Array#sort is a native numeric sort, avoiding the JS comparator
+// callback that Array#sort needs for numbers.
+function sortedFinite(values) {
+  return Float64Array.from(values.filter((v) => Number.isFinite(v))).sort();
 }
 
 function median(values) {
-  const xs = values.filter((v) => Number.isFinite(v)).sort((a, b) => a - b);
+  const xs = sortedFinite(values);
   if (!xs.length) return null;
   const mid = Math.floor(xs.length / 2);
   if (xs.length % 2 === 1) return xs[mid];
@@ -32,7 +67,7 @@ function median(values) {
 }
 
 function percentile(values, p) {
-  const xs = values.filter((v) => Number.isFinite(v)).sort((a, b) => a - b);
+  const xs = sortedFinite(values);
   if (!xs.length) return null;
   if (xs.length === 1) return xs[0];
   const idx = (xs.length - 1) * p;
@@ -42,17 +77,50 @@ function percentile(values, p) {
   return xs[lo] + (xs[hi] - xs[lo]) * frac;
 }
 
-function readUrls(urlsFile, singleUrl) {
+const METRIC_KEYS = ["perfScore", "lcp", "inp", "cls", "tbt", "fcp", "ttfb"];
+
+// Collect every metric's finite values in a single pass over the items,
+// instead of one map+filter traversal per metric.
+function metricColumns(items) {
+  const cols = {};
+  for (const k of METRIC_KEYS) cols[k] = [];
+  for (const { metrics } of items) {
+    for (const k of METRIC_KEYS) {
+      const v = metrics[k];
+      if (Number.isFinite(v)) cols[k].push(v);
+    }
+  }
+  return cols;
+}
+
+async function readUrls(urlsFile, singleUrl) {
   if (singleUrl) return [singleUrl.trim()];
   if (!urlsFile) throw new Error("Provide --url or --urls-file");
-  const lines = fs.readFileSync(urlsFile, "utf8").split(/\r?\n/);
-  return lines.map((s) => s.trim()).filter((s) => s && !s.startsWith("#"));
+  // Stream the file line by line instead of reading and splitting it whole.
+  const rl = readline.createInterface({
+    input: fs.createReadStream(urlsFile, "utf8"),
+    crlfDelay: Infinity,
+  });
+  const urls = [];
+  for await (const line of rl) {
+    const s = line.trim();
+    if (s && s[0] !== "#") urls.push(s);
+  }
+  return urls;
 }
 
+// The URL part of a filename is the same for every repeat and device, so it is
+// computed once per URL.
+const SANITIZED_URLS = new Map();
+const SANITIZED_URLS_MAX = 4096;
+
 function sanitizeFilename(url, uniqueSuffix = "") {
-  let s = url.replace(/^https?:\/\//, "");
-  s = s.replace(/[/:?&=#]+/g, "_");
-  s = s.slice(0, 150);
+  let s = SANITIZED_URLS.get(url);
+  if (s === undefined) {
+    s = url.replace(RE_URL_SCHEME, "").replace(RE_URL_SEPARATORS, "_").slice(0, 150);
+    if (SANITIZED_URLS.size >= SANITIZED_URLS_MAX) SANITIZED_URLS.clear();
+    SANITIZED_URLS.set(url, s);
+  }
   if (uniqueSuffix) s = `${s}__${uniqueSuffix.slice(0, 30)}`;
   return s;
 }
@@ -63,18 +131,20 @@ function runCmd(command, args, timeoutSec) {
       shell: process.platform === "win32",
       windowsHide: true,
     });
-    let stdout = "";
-    let stderr = "";
+    // Keep raw chunks: decoding each chunk separately can split multi-byte
+    // UTF-8 sequences, and stdout may be a multi-MB LHR.
+    const stdout = [];
+    const stderr = [];
     const timer = setTimeout(() => {
       child.kill("SIGKILL");
       reject(new Error(`Command timeout after ${timeoutSec}s`));
     }, timeoutSec * 1000);
 
     child.stdout.on("data", (chunk) => {
-      stdout += chunk.toString();
+      stdout.push(chunk);
     });
     child.stderr.on("data", (chunk) => {
-      stderr += chunk.toString();
+      stderr.push(chunk);
     });
     child.on("error", (err) => {
       clearTimeout(timer);
@@ -82,7 +152,7 @@ function runCmd(command, args, timeoutSec) {
     });
     child.on("close", (code) => {
       clearTimeout(timer);
-      resolve({ code, stdout, stderr });
+      resolve({ code, stdout: Buffer.concat(stdout), stderr: Buffer.concat(stderr).toString() });
     });
   });
 }
@@ -91,27 +161,170 @@ function findLighthouseBin(preferNpx) {
   return preferNpx ? "npx" : "lighthouse";
 }
 
-function auditNumeric(lhr, auditId) {
-  const audit = (lhr.audits || {})[auditId];
+const LH_WORKER_PATH = path.join(__dirname, "lh_worker.js");
+
+function effectiveChromeFlags(chromeFlags, userDataDir) {
+  if (userDataDir && !chromeFlags.includes("--user-data-dir")) {
+    return `${chromeFlags} --user-data-dir=${userDataDir}`;
+  }
+  return chromeFlags;
+}
+
+// Everything except the URL is identical across runs, so the command is built
+// once in main(); each run only splices its URL in between.
+function buildLighthouseCommand({ preferNpx, device, chromeFlags, userDataDir }) {
+  const effectiveFlags = effectiveChromeFlags(chromeFlags, userDataDir);
+  return {
+    cmd: findLighthouseBin(preferNpx),
+    binArgs: preferNpx ? ["lighthouse"] : [],
+    flagArgs: [
+      "--quiet",
+      "--output=json",
+      "--output-path=stdout",
+      "--only-categories=performance",
+      `--skip-audits=${SKIPPED_AUDITS.join(",")}`,
+      "--disable-full-page-screenshot",
+      `--form-factor=${device}`,
+      `--chrome-flags=${effectiveFlags}`,
+    ],
+  };
+}
+
+// Node API equivalent of buildLighthouseCommand's CLI flags, for lh_worker.js.
+function buildWorkerConfig({ device, chromeFlags, userDataDir }) {
+  return {
+    chromeFlags: effectiveChromeFlags(chromeFlags, userDataDir).split(/\s+/).filter(Boolean),
+    flags: {
+      logLevel: "silent",
+      output: "json",
+      onlyCategories: ["performance"],
+      skipAudits: SKIPPED_AUDITS,
+      disableFullPageScreenshot: true,
+      formFactor: device,
+    },
+  };
+}
+
+// A runner turns a URL into the raw LHR JSON bytes. The CLI runner spawns one
+// Lighthouse process per run.
+function createCliRunner(lighthouseCmd, timeoutSec) {
+  const { cmd, binArgs, flagArgs } = lighthouseCmd;
+  return {
+    async run(url) {
+      const { code, stdout, stderr } = await runCmd(cmd, [...binArgs, url, ...flagArgs], timeoutSec);
+      if (code !== 0) {
+        throw new Error(`Lighthouse failed (rc=${code}). stderr:\n${stderr.trim()}\nstdout:\n${stdout.toString().trim()}`);
+      }
+      return stdout;
+    },
+    close() {},
+  };
+}
+
+// The worker runner keeps up to `size` long-lived lh_worker.js processes that
+// load Lighthouse once and then take URLs over the IPC channel, so Node startup
+// and module loading are paid per worker instead of per run. A worker that
+// times out or dies is killed and replaced on demand.
+function createWorkerRunner(size, workerConfig, timeoutSec) {
+  const idle = [];
+  const queue = [];
+  const live = new Set();
+
+  const settle = (child, err, lhr) => {
+    const { job } = child;
+    child.job = null;
+    clearTimeout(job.timer);
+    if (err) job.reject(err);
+    else job.resolve(lhr);
+  };
+
+  const dispatch = (child) => {
+    const job = queue.shift();
+    if (!job) {
+      idle.push(child);
+      return;
+    }
+    child.job = job;
+    job.timer = setTimeout(() => {
+      settle(child, new Error(`Command timeout after ${timeoutSec}s`));
+      child.kill("SIGKILL");
+    }, timeoutSec * 1000);
+    child.send({ url: job.url });
+  };
+
+  const spawnWorker = () => {
+    const child = fork(LH_WORKER_PATH, [JSON.stringify(workerConfig)], {
+      serialization: "advanced",
+      windowsHide: true,
+    });
+    live.add(child);
+    child.on("message", ({ lhr, error }) => {
+      if (!child.job) return;
+      if (error) settle(child, new Error(`Lighthouse failed: ${error}`));
+      else settle(child, null, Buffer.from(lhr.buffer, lhr.byteOffset, lhr.byteLength));
+      dispatch(child);
+    });
+    const onGone = (reason) => {
+      if (!live.delete(child)) return;
+      const i = idle.indexOf(child);
+      if (i !== -1) idle.splice(i, 1);
+      if (child.job) settle(child, new Error(`Lighthouse worker ${reason}`));
+      if (queue.length && live.size < size) dispatch(spawnWorker());
+    };
+    child.on("exit", (code, signal) => onGone(`exited (code=${code}, signal=${signal})`));
+    child.on("error", (err) => onGone(`failed: ${err.message}`));
+    return child;
+  };
+
+  return {
+    run(url) {
+      return new Promise((resolve, reject) => {
+        queue.push({ url, resolve, reject });
+        if (idle.length) dispatch(idle.pop());
+        else if (live.size < size) dispatch(spawnWorker());
+      });
+    },
+    close() {
+      for (const child of live) child.kill();
+    },
+  };
+}
+
+// Both helpers take the already-resolved `lhr.audits` map (see extractMetrics).
+function auditNumeric(audits, auditId) {
+  const audit = audits[auditId];
   if (!audit) return null;
   const v = audit.numericValue;
   return Number.isFinite(v) ? Number(v) : null;
 }
 
-function auditItems(lhr, auditId) {
-  const audit = (lhr.audits || {})[auditId] || {};
+function auditItems(audits, auditId) {
+  const audit = audits[auditId] || {};
   const details = audit.details || {};
   return Array.isArray(details.items) ? details.items : [];
 }
 
+// Metric -> candidate audit ids, tried in order until one has a numericValue.
+const METRIC_AUDITS = [
+  ["lcp", ["largest-contentful-paint"]],
+  ["inp", ["interaction-to-next-paint", "experimental-interaction-to-next-paint"]],
+  ["cls", ["cumulative-layout-shift"]],
+  ["tbt", ["total-blocking-time"]],
+  ["fcp", ["first-contentful-paint"]],
+  ["ttfb", ["server-response-time"]],
+];
+
 function extractMetrics(lhr) {
-  const lcp = auditNumeric(lhr, "largest-contentful-paint");
-  const cls = auditNumeric(lhr, "cumulative-layout-shift");
-  const tbt = auditNumeric(lhr, "total-blocking-time");
-  const fcp = auditNumeric(lhr, "first-contentful-paint");
-  const ttfb = auditNumeric(lhr, "server-response-time");
-  let inp = auditNumeric(lhr, "interaction-to-next-paint");
-  if (inp === null) inp = auditNumeric(lhr, "experimental-interaction-to-next-paint");
+  const audits = lhr.audits || {};
+  const values = {};
+  for (const [key, auditIds] of METRIC_AUDITS) {
+    let v = null;
+    for (const auditId of auditIds) {
+      v = auditNumeric(audits, auditId);
+      if (v !== null) break;
+    }
+    values[key] = v;
+  }
 
   const perfScore = Number.isFinite(lhr?.categories?.performance?.score)
     ? Number(lhr.categories.performance.score)
@@ -119,7 +332,7 @@ function extractMetrics(lhr) {
 
   /* 1. LCP Element Information */
   // LCP Element audit structure is complex: details -> items (list) -> item (table) -> items (rows) -> item -> node
-  const lcpAudit = (lhr.audits || {})["largest-contentful-paint-element"];
+  const lcpAudit = audits["largest-contentful-paint-element"];
   let lcpNode = null;
   if (lcpAudit && lcpAudit.details && lcpAudit.details.items && lcpAudit.details.items.length) {
     const firstTable = lcpAudit.details.items[0];
@@ -138,7 +351,7 @@ function extractMetrics(lhr) {
     : null;
 
   /* 2. Top Blocking Resource */
-  const rbItems = auditItems(lhr, "render-blocking-resources");
+  const rbItems = auditItems(audits, "render-blocking-resources");
   const rbTop = rbItems
     .slice(0, 5)
     .map((it) => ({
@@ -152,7 +365,7 @@ function extractMetrics(lhr) {
   // The 'items' array usually contains the events. We look for the one with highest duration.
   // Note: Lighthouse structure for INP can vary, but usually it's in details.items
   let inpTarget = null;
-  const inpItems = auditItems(lhr, "interaction-to-next-paint");
+  const inpItems = auditItems(audits, "interaction-to-next-paint");
   // Find the item with the longest processing duration or total duration
   if (inpItems && inpItems.length > 0) {
     const worstInp = inpItems.sort((a, b) => (b.duration || 0) - (a.duration || 0))[0];
@@ -167,7 +380,7 @@ function extractMetrics(lhr) {
 
   // Fallback: check experimental-interaction-to-next-paint if standard one is empty
   if (!inpTarget) {
-    const expInpItems = auditItems(lhr, "experimental-interaction-to-next-paint");
+    const expInpItems = auditItems(audits, "experimental-interaction-to-next-paint");
     if (expInpItems && expInpItems.length > 0) {
       const worstExp = expInpItems.sort((a, b) => (b.duration || 0) - (a.duration || 0))[0];
       inpTarget = worstExp.selector || worstExp.nodeLabel;
@@ -176,12 +389,7 @@ function extractMetrics(lhr) {
 
   return {
     perfScore,
-    lcp,
-    inp,
-    cls,
-    tbt,
-    fcp,
-    ttfb,
+    ...values,
     diagnostics: {
       lcpElement: lcpElementInfo,
       renderBlockingTop: rbTop,
@@ -196,52 +404,176 @@ function fmtMs(v) {
   return `${Math.round(v)}ms`;
 }
 
+const TIME_METRICS = ["lcp", "ttfb", "fcp", "tbt", "inp"];
+
+// Format every time metric of a result once; the console summary and the CSV
+// row both read from this instead of calling fmtMs per use.
+function formatTimes(m) {
+  const out = {};
+  for (const k of TIME_METRICS) out[k] = fmtMs(m[k]);
+  return out;
+}
+
+// Metrics ranked in summary.worst, with their console label and formatter.
+// summarize() computes the rankings once; main() only prints them.
+const WORST_METRICS = [
+  ["lcp", "LCP", fmtMs],
+  ["ttfb", "TTFB", fmtMs],
+  ["fcp", "FCP", fmtMs],
+  ["tbt", "TBT", fmtMs],
+  ["cls", "CLS", (v) => (Number.isFinite(v) ? v.toFixed(3) : "")],
+  ["inp", "INP", fmtMs],
+];
+
+// JSON.parse of a multi-MB LHR plus extractMetrics is the only real CPU work
+// per run; doing it on the main thread serializes it across all concurrent
+// Lighthouse processes. Worker threads re-enter this file (see bottom) and only
+// send back the small metrics object. When --keep-lhr is set the worker also
+// writes the raw report while it parses, so disk I/O never blocks the runner.
+// The report bytes are transferred rather than copied to the worker, which
+// also does the UTF-8 decode.
+function createParsePool(size) {
+  const idle = [];
+  const queue = [];
+  let spawned = 0;
+
+  const dispatch = (worker) => {
+    const job = queue.shift();
+    if (!job) {
+      idle.push(worker);
+      return;
+    }
+    worker.job = job;
+    worker.postMessage(job.task, job.transferList);
+  };
+
+  const spawnWorker = () => {
+    const worker = new Worker(__filename);
+    spawned += 1;
+    worker.on("message", ({ metrics, error }) => {
+      const { job } = worker;
+      worker.job = null;
+      if (error) job.reject(new Error(error));
+      else job.resolve(metrics);
+      dispatch(worker);
+    });
+    worker.on("error", (err) => {
+      spawned -= 1;
+      const i = idle.indexOf(worker);
+      if (i !== -1) idle.splice(i, 1);
+      if (worker.job) worker.job.reject(err);
+    });
+    return worker;
+  };
+
+  return {
+    parse(task, transferList = []) {
+      return new Promise((resolve, reject) => {
+        queue.push({ task, transferList, resolve, reject });
+        if (idle.length) dispatch(idle.pop());
+        else if (spawned < size) dispatch(spawnWorker());
+      });
+    },
+    close() {
+      return Promise.all(idle.splice(0).map((w) => w.terminate()));
+    },
+  };
+}
+
+// Small Buffers are slices of Node's shared allocation pool; only transfer an
+// ArrayBuffer the Buffer owns outright, otherwise copy its bytes out.
+function ownedArrayBuffer(buf) {
+  if (buf.byteOffset === 0 && buf.byteLength === buf.buffer.byteLength) return buf.buffer;
+  return buf.buffer.slice(buf.byteOffset, buf.byteOffset + buf.byteLength);
+}
+
+function runParseWorker() {
+  parentPort.on("message", async ({ lhrBytes, lhrPath }) => {
+    try {
+      const buf = Buffer.from(lhrBytes);
+      const writing = lhrPath ? fs.promises.writeFile(lhrPath, buf) : null;
+      const metrics = extractMetrics(JSON.parse(buf.toString("utf8")));
+      if (writing) await writing;
+      parentPort.postMessage({ metrics });
+    } catch (err) {
+      parentPort.postMessage({ error: err.message || String(err) });
+    }
+  });
+}
+
+// Bump when extractMetrics output changes so older cache entries are ignored.
+const CACHE_VERSION = 1;
+
+// Per-run metrics cache under <output>/cache/, keyed by a hash of everything
+// that determines a run (URL, device, chrome flags, run id). Entries older
+// than the TTL by mtime count as misses; only the small metrics are stored.
+function createResultCache(dir, ttlMs, { device, chromeFlags }) {
+  fs.mkdirSync(dir, { recursive: true });
+  const fileFor = (url, runId) => {
+    const key = crypto.createHash("blake2b512")
+      .update(`${CACHE_VERSION}|${url}|${device}|${chromeFlags}|${runId}`)
+      .digest("hex")
+      .slice(0, 32);
+    return path.join(dir, `${key}.json`);
+  };
+  return {
+    async get(url, runId) {
+      const file = fileFor(url, runId);
+      try {
+        const { mtimeMs } = await fs.promises.stat(file);
+        if (Date.now() - mtimeMs > ttlMs) return null;
+        return JSON.parse(await fs.promises.readFile(file, "utf8"));
+      } catch {
+        return null;
+      }
+    },
+    async set(url, runId, metrics) {
+      try {
+        await fs.promises.writeFile(fileFor(url, runId), JSON.stringify(metrics), "utf8");
+      } catch {
+        // A failed cache write only costs a re-run next time.
+      }
+    },
+  };
+}
+
+// Resolves as soon as the Lighthouse run itself has finished. `parsed` settles
+// once the parse worker is done, so the caller can start the next run while
+// this one is still being decoded.
 async function lighthouseOnce({
   url,
   outDir,
   device,
-  timeoutSec,
-  preferNpx,
-  chromeFlags,
-  userDataDir,
+  runner,
   runId,
+  keepLhr,
+  parsePool,
+  cache,
 }) {
-  fs.mkdirSync(outDir, { recursive: true });
-  const uniqueId = runId ? `${device}__${runId}` : device;
-  const filename = `${sanitizeFilename(url, uniqueId)}.lhr.json`;
-  const lhrPath = path.join(outDir, filename);
-
-  let effectiveFlags = chromeFlags;
-  if (userDataDir && !effectiveFlags.includes("--user-data-dir")) {
-    effectiveFlags = `${effectiveFlags} --user-data-dir=${userDataDir}`;
+  let lhrPath = null;
+  if (keepLhr) {
+    const uniqueId = runId ? `${device}__${runId}` : device;
+    lhrPath = path.join(outDir, `${sanitizeFilename(url, uniqueId)}.lhr.json`);
   }
 
-  const cmd = findLighthouseBin(preferNpx);
-  const args = [
-    url,
-    "--quiet",
-    "--output=json",
-    `--output-path=${lhrPath}`,
-    "--only-categories=performance",
-    `--form-factor=${device}`,
-    `--chrome-flags=${effectiveFlags}`,
-  ];
-  if (preferNpx) args.unshift("lighthouse");
-
-  const { code, stdout, stderr } = await runCmd(cmd, args, timeoutSec);
-  if (code !== 0) {
-    throw new Error(`Lighthouse failed (rc=${code}). stderr:\n${stderr.trim()}\nstdout:\n${stdout.trim()}`);
+  const cached = cache ? await cache.get(url, runId) : null;
+  if (cached) {
+    // Only point at a raw report if an earlier --keep-lhr run left one behind.
+    if (lhrPath && !fs.existsSync(lhrPath)) lhrPath = null;
+    return { parsed: Promise.resolve({ url, device, lhrPath, metrics: cached, cached: true }) };
   }
 
-  const lhr = JSON.parse(fs.readFileSync(lhrPath, "utf8"));
-  const metrics = extractMetrics(lhr);
-
-  return {
-    url,
-    device,
-    lhrPath,
-    metrics,
-  };
+  const lhrBytes = ownedArrayBuffer(await runner.run(url));
+  const parsed = parsePool.parse({ lhrBytes, lhrPath }, [lhrBytes]).then(async (metrics) => {
+    if (cache) await cache.set(url, runId, metrics);
+    return {
+      url,
+      device,
+      lhrPath,
+      metrics,
+    };
+  });
+  return { parsed };
 }
 
 async function runUrlRepeats({
@@ -249,39 +581,48 @@ async function runUrlRepeats({
   repeats,
   outDir,
   device,
-  timeoutSec,
-  preferNpx,
-  chromeFlags,
-  userDataDir,
+  runner,
+  keepLhr,
+  parsePool,
+  cache,
 }) {
-  const runs = [];
-  const errors = [];
+  // One outcome per run, in run order; parses are not awaited inside the loop.
+  const outcomes = [];
   for (let i = 0; i < repeats; i += 1) {
     try {
       const runId = repeats > 1 ? `run${i + 1}` : "";
-      const result = await lighthouseOnce({
+      const { parsed } = await lighthouseOnce({
         url,
         outDir,
         device,
-        timeoutSec,
-        preferNpx,
-        chromeFlags,
-        userDataDir,
+        runner,
         runId,
+        keepLhr,
+        parsePool,
+        cache,
       });
-      runs.push(result);
+      outcomes.push(parsed.then((result) => ({ result }), (err) => ({ error: err.message })));
     } catch (err) {
-      errors.push(err.message);
+      outcomes.push({ error: err.message });
     }
   }
 
+  const runs = [];
+  const errors = [];
+  for (const { result, error } of await Promise.all(outcomes)) {
+    if (result) runs.push(result);
+    else errors.push(error);
+  }
+
   if (!runs.length) {
     const errMsg = errors.slice(0, 3).join("; ") || "unknown error";
     return { url, device, error: errMsg, allErrors: errors };
   }
 
-  const collect = (k) => runs.map((r) => r.metrics[k]).filter((v) => Number.isFinite(v));
-  const medianLcp = median(collect("lcp"));
+  const cols = metricColumns(runs);
+  const metrics = {};
+  for (const k of METRIC_KEYS) metrics[k] = median(cols[k]);
+  const medianLcp = metrics.lcp;
   // Find representative run (closest to median LCP)
   let bestRun = runs[0];
   let minDiff = Infinity;
@@ -294,39 +635,24 @@ async function runUrlRepeats({
     }
   }
 
-  const metrics = {
-    perfScore: median(collect("perfScore")),
-    lcp: medianLcp,
-    inp: median(collect("inp")),
-    cls: median(collect("cls")),
-    tbt: median(collect("tbt")),
-    fcp: median(collect("fcp")),
-    ttfb: median(collect("ttfb")),
-    // Use diagnostics from the representative run
-    diagnostics: bestRun.metrics.diagnostics,
-  };
+  // Use diagnostics from the representative run
+  metrics.diagnostics = bestRun.metrics.diagnostics;
 
   return {
     url,
     device,
     repeats,
     metrics,
-    grades: {
-      LCP: grade("LCP", metrics.lcp),
-      INP: grade("INP", metrics.inp),
-      CLS: grade("CLS", metrics.cls),
-      TBT: grade("TBT", metrics.tbt),
-      FCP: grade("FCP", metrics.fcp),
-      TTFB: grade("TTFB", metrics.ttfb),
-    },
+    grades: gradeAll(metrics),
     sampleLhr: runs[0].lhrPath,
+    cachedRuns: runs.filter((r) => r.cached).length,
     errors,
   };
 }
 
 function summarize(results) {
   const ok = results.filter((r) => !r.error);
-  const collect = (k) => ok.map((r) => r.metrics[k]).filter((v) => Number.isFinite(v));
+  const cols = metricColumns(ok);
   const summary = {
     count: results.length,
     success: ok.length,
@@ -337,19 +663,28 @@ function summarize(results) {
   };
 
   for (const key of ["lcp", "inp", "cls", "tbt", "fcp", "ttfb", "perfScore"]) {
-    const arr = collect(key);
+    const arr = cols[key];
     if (!arr.length) continue;
     summary.avg[key] = arr.reduce((a, b) => a + b, 0) / arr.length;
     summary.p75[key] = percentile(arr, 0.75);
   }
 
-  const topWorst = (key, n = 5) => ok
-    .map((r) => [r.url, r.metrics[key]])
-    .filter(([, v]) => Number.isFinite(v))
-    .sort((a, b) => b[1] - a[1])
-    .slice(0, n);
+  // Keep only the current top n (sorted descending) instead of sorting every
+  // result; strict comparisons preserve input order on ties, like a stable sort.
+  const topWorst = (key, n = 5) => {
+    const top = [];
+    for (const r of ok) {
+      const v = r.metrics[key];
+      if (!Number.isFinite(v) || (top.length === n && v <= top[n - 1][1])) continue;
+      let i = top.length;
+      while (i > 0 && top[i - 1][1] < v) i -= 1;
+      top.splice(i, 0, [r.url, v]);
+      if (top.length > n) top.pop();
+    }
+    return top;
+  };
 
-  for (const metric of ["lcp", "ttfb", "fcp", "tbt", "cls", "inp"]) {
+  for (const [metric] of WORST_METRICS) {
     summary.worst[metric] = topWorst(metric);
   }
 
@@ -390,48 +725,114 @@ function summarize(results) {
   return summary;
 }
 
+// [summary.attribution key, section title, key column header]
+const ATTRIBUTION_SECTIONS = [
+  ["lcpElements", "🛑 Top LCP Bottlenecks (LCP Element)", "Selector / URL"],
+  ["blockingResources", "🚧 Top Blocking Resources", "Resource URL"],
+  ["inpTargets", "🖱️ Top Slow Interactions (INP Target)", "Interaction Target"],
+];
+
+function attributionTable(title, data, keyHeader) {
+  if (!data || data.length === 0) {
+    return [`## ${title}`, `_No data detected._`, ``];
+  }
+  return [
+    `## ${title}`,
+    `| Count | ${keyHeader} |`,
+    `|-------|--------------|`,
+    // Top 20 only to keep it readable; escape pipes so keys cannot break the table
+    ...data.slice(0, 20).map((item) => `| ${item.count} | \`${item.key.replace(RE_PIPE, '\\|')}\` |`),
+    ``,
+  ];
+}
+
 function generateAttributionMarkdown(summary) {
-  const lines = [];
-  lines.push(`# Performance Attribution Report`);
-  lines.push(`Generated at: ${new Date().toISOString()}`);
-  lines.push(`Total Pages Analyzed: ${summary.count} (Success: ${summary.success}, Failed: ${summary.failed})`);
-  lines.push(``);
-
-  const makeTable = (title, data, keyHeader) => {
-    lines.push(`## ${title}`);
-    if (!data || data.length === 0) {
-      lines.push(`_No data detected._`);
-      lines.push(``);
-      return;
-    }
-    lines.push(`| Count | ${keyHeader} |`);
-    lines.push(`|-------|--------------|`);
-    // Top 20 only to keep it readable
-    for (const item of data.slice(0, 20)) {
-      // Escape pipe characters in key to prevent breaking markdown table
-      const keySafe = item.key.replace(/\|/g, '\\|');
-      lines.push(`| ${item.count} | \`${keySafe}\` |`);
-    }
-    lines.push(``);
-  };
+  return [
+    `# Performance Attribution Report`,
+    `Generated at: ${new Date().toISOString()}`,
+    `Total Pages Analyzed: ${summary.count} (Success: ${summary.success}, Failed: ${summary.failed})`,
+    ``,
+    ...ATTRIBUTION_SECTIONS.flatMap(([key, title, keyHeader]) => (
+      attributionTable(title, summary.attribution[key], keyHeader)
+    )),
+  ].join("\n");
+}
 
-  makeTable("🛑 Top LCP Bottlenecks (LCP Element)", summary.attribution.lcpElements, "Selector / URL");
-  makeTable("🚧 Top Blocking Resources", summary.attribution.blockingResources, "Resource URL");
-  makeTable("🖱️ Top Slow Interactions (INP Target)", summary.attribution.inpTargets, "Interaction Target");
+const CSV_HEADERS = [
+  "URL",
+  "性能分数",
+  "LCP",
+  "LCP评级",
+  "TTFB",
+  "TTFB评级",
+  "FCP",
+  "FCP评级",
+  "TBT",
+  "TBT评级",
+  "CLS",
+  "CLS评级",
+  "INP",
+  "INP评级",
+  "LCP元素/来源",
+  "最大阻塞资源",
+  "INP交互元素",
+  "错误信息",
+];
+
+function csvQuote(s) {
+  return `"${(s || "").replace(RE_DOUBLE_QUOTE, '""')}"`;
+}
 
-  return lines.join("\n");
+// One CSV line per result, cells in CSV_HEADERS order. `times` is the
+// formatTimes() output for successful results.
+function csvRow(r, times) {
+  if (r.error) {
+    return [r.url, ...new Array(CSV_HEADERS.length - 2).fill(""), csvQuote(r.error)].join(",");
+  }
+  const m = r.metrics;
+  const dia = m.diagnostics || {};
+  const lcpDesc = dia.lcpElement ? (dia.lcpElement.selector || dia.lcpElement.url) : "";
+  const rbDesc = dia.renderBlockingTop ? `${Math.round(dia.renderBlockingTop.wastedMs)}ms - ${dia.renderBlockingTop.url}` : "";
+  const inpDesc = dia.inpTarget || "";
+
+  const score = Number.isFinite(m.perfScore) ? Math.round(m.perfScore * 100) : "";
+  return [
+    r.url,
+    score,
+    times.lcp,
+    r.grades.LCP,
+    times.ttfb,
+    r.grades.TTFB,
+    times.fcp,
+    r.grades.FCP,
+    times.tbt,
+    r.grades.TBT,
+    m.cls ?? "",
+    r.grades.CLS,
+    times.inp,
+    r.grades.INP,
+    // Diagnostics columns
+    csvQuote(lcpDesc),
+    csvQuote(rbDesc),
+    csvQuote(inpDesc),
+    "",
+  ].join(",");
 }
 
 function parseArgs(argv) {
   const args = {
     device: "mobile",
     repeats: 1,
-    concurrency: 2,
+    concurrency: null,
     timeoutSec: 180,
     output: "lcp_output",
     preferNpx: false,
     chromeFlags: "--headless=new --no-sandbox --disable-gpu --disable-dev-shm-usage",
     userDataDir: "",
+    keepLhr: false,
+    persistentWorkers: false,
+    noCache: false,
+    cacheTtl: 24,
     urlsFile: "",
     url: "",
   };
@@ -447,10 +848,19 @@ function parseArgs(argv) {
     else if (arg === "--prefer-npx") args.preferNpx = true;
     else if (arg === "--chrome-flags") args.chromeFlags = argv[++i];
     else if (arg === "--user-data-dir") args.userDataDir = argv[++i];
+    else if (arg === "--keep-lhr") args.keepLhr = true;
+    else if (arg === "--persistent-workers") args.persistentWorkers = true;
+    else if (arg === "--no-cache") args.noCache = true;
+    else if (arg === "--cache-ttl") args.cacheTtl = Number(argv[++i]);
   }
   return args;
 }
 
+function cpuCount() {
+  if (typeof os.availableParallelism === "function") return os.availableParallelism();
+  return os.cpus().length || 1;
+}
+
 async function runPool(items, concurrency, worker) {
   const results = [];
   let index = 0;
@@ -484,14 +894,22 @@ async function main() {
   if (!Number.isFinite(args.repeats) || args.repeats < 1) {
     throw new Error("--repeats must be >= 1");
   }
-  if (!Number.isFinite(args.concurrency) || args.concurrency < 1) {
+  if (args.concurrency !== null && (!Number.isFinite(args.concurrency) || args.concurrency < 1)) {
     throw new Error("--concurrency must be >= 1");
   }
+  if (!Number.isFinite(args.cacheTtl) || args.cacheTtl < 0) {
+    throw new Error("--cache-ttl must be >= 0 (hours)");
+  }
 
-  const urls = readUrls(args.urlsFile, args.url);
+  const urls = await readUrls(args.urlsFile, args.url);
+  const cpus = cpuCount();
+  // Each headless Chrome keeps a core busy, so by default run one per two cores.
+  if (args.concurrency === null) {
+    args.concurrency = Math.max(1, Math.min(urls.length, Math.floor(cpus / 2)));
+  }
   const outDir = path.resolve(args.output);
   fs.mkdirSync(outDir, { recursive: true });
-  fs.mkdirSync(path.join(outDir, "lhr"), { recursive: true });
+  if (args.keepLhr) fs.mkdirSync(path.join(outDir, "lhr"), { recursive: true });
 
   const userDataDir = args.userDataDir
     || (process.platform === "win32" ? path.join(outDir, "chrome-profile") : "");
@@ -502,30 +920,55 @@ async function main() {
   );
   console.log(`Output: ${outDir}`);
 
+  const cacheDir = path.join(outDir, "cache");
+  const cache = args.noCache
+    ? null
+    : createResultCache(cacheDir, args.cacheTtl * 3600 * 1000, {
+      device: args.device,
+      chromeFlags: args.chromeFlags,
+    });
+  console.log(`Cache: ${cache ? `${cacheDir} (ttl=${args.cacheTtl}h)` : "disabled"}`);
+
+  // Parse workers are spawned lazily, so sizing by cores never over-allocates.
+  const parsePool = createParsePool(cpus);
+  const lighthouseOpts = {
+    preferNpx: args.preferNpx,
+    device: args.device,
+    chromeFlags: args.chromeFlags,
+    userDataDir,
+  };
+  const runner = args.persistentWorkers
+    ? createWorkerRunner(args.concurrency, buildWorkerConfig(lighthouseOpts), args.timeoutSec)
+    : createCliRunner(buildLighthouseCommand(lighthouseOpts), args.timeoutSec);
   const results = await runPool(urls, args.concurrency, (u) => runUrlRepeats({
     url: u,
     repeats: args.repeats,
     outDir: path.join(outDir, "lhr"),
     device: args.device,
-    timeoutSec: args.timeoutSec,
-    preferNpx: args.preferNpx,
-    chromeFlags: args.chromeFlags,
-    userDataDir,
+    runner,
+    keepLhr: args.keepLhr,
+    parsePool,
+    cache,
   }));
+  runner.close();
+  await parsePool.close();
 
-  for (const r of results) {
+  const formatted = results.map((r) => (r.error ? null : formatTimes(r.metrics)));
+  results.forEach((r, i) => {
     if (r.error) {
       console.log(`[FAIL] ${r.url}\n  ${r.error}\n`);
-      continue;
+      return;
     }
     const m = r.metrics;
-    console.log(`[OK] ${r.url}`);
+    const t = formatted[i];
+    const cachedNote = r.cachedRuns ? ` (cached ${r.cachedRuns}/${r.repeats})` : "";
+    console.log(`[OK] ${r.url}${cachedNote}`);
     console.log(
-      `  LCP=${fmtMs(m.lcp)} (${r.grades.LCP})  INP=${fmtMs(m.inp)} (${r.grades.INP})  CLS=${m.cls ?? ""
-      } (${r.grades.CLS})  TTFB=${fmtMs(m.ttfb)} (${r.grades.TTFB})`,
+      `  LCP=${t.lcp} (${r.grades.LCP})  INP=${t.inp} (${r.grades.INP})  CLS=${m.cls ?? ""
+      } (${r.grades.CLS})  TTFB=${t.ttfb} (${r.grades.TTFB})`,
     );
     console.log("");
-  }
+  });
 
   const summary = summarize(results);
   const report = {
@@ -539,86 +982,12 @@ async function main() {
   fs.writeFileSync(jsonPath, JSON.stringify(report, null, 2), "utf8");
 
   const csvPath = path.join(outDir, "report.csv");
-  const headers = [
-    "URL",
-    "性能分数",
-    "LCP",
-    "LCP评级",
-    "TTFB",
-    "TTFB评级",
-    "FCP",
-    "FCP评级",
-    "TBT",
-    "TBT评级",
-    "CLS",
-    "CLS评级",
-    "INP",
-    "INP评级",
-    "LCP元素/来源",
-    "最大阻塞资源",
-    "INP交互元素",
-    "错误信息",
-  ];
-  const rows = [headers.join(",")];
-  for (const r of results) {
-    if (r.error) {
-      rows.push([
-        r.url,
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        "",
-        `"${r.error.replace(/"/g, '""')}"`,
-      ].join(","));
-      continue;
-    }
-    const m = r.metrics;
-    const dia = m.diagnostics || {};
-    const lcpDesc = dia.lcpElement ? (dia.lcpElement.selector || dia.lcpElement.url) : "";
-    const rbDesc = dia.renderBlockingTop ? `${Math.round(dia.renderBlockingTop.wastedMs)}ms - ${dia.renderBlockingTop.url}` : "";
-    const inpDesc = dia.inpTarget || "";
-
-    const score = Number.isFinite(m.perfScore) ? Math.round(m.perfScore * 100) : "";
-    rows.push([
-      r.url,
-      score,
-      fmtMs(m.lcp),
-      r.grades.LCP,
-      fmtMs(m.ttfb),
-      r.grades.TTFB,
-      fmtMs(m.fcp),
-      r.grades.FCP,
-      fmtMs(m.tbt),
-      r.grades.TBT,
-      m.cls ?? "",
-      r.grades.CLS,
-      fmtMs(m.inp),
-      r.grades.INP,
-      // Diagnostics columns
-      `"${(lcpDesc || "").replace(/"/g, '""')}"`,
-      `"${(rbDesc || "").replace(/"/g, '""')}"`,
-      `"${(inpDesc || "").replace(/"/g, '""')}"`,
-      "",
-    ].join(","));
-  }
+  const csvLines = [CSV_HEADERS.join(","), ...results.map((r, i) => csvRow(r, formatted[i]))];
 
   const reportMdPath = path.join(outDir, "attribution_report.md");
 
 
-  fs.writeFileSync(csvPath, `${rows.join(os.EOL)}${os.EOL}`, "utf8");
+  fs.writeFileSync(csvPath, `${csvLines.join(os.EOL)}${os.EOL}`, "utf8");
 
   // Write Attribution Report
   const mdContent = generateAttributionMarkdown(summary);
@@ -626,14 +995,7 @@ async function main() {
 
   console.log("=== Summary ===");
   console.log(JSON.stringify(summary, null, 2));
-  for (const [metric, label, formatter] of [
-    ["lcp", "LCP", fmtMs],
-    ["ttfb", "TTFB", fmtMs],
-    ["fcp", "FCP", fmtMs],
-    ["tbt", "TBT", fmtMs],
-    ["cls", "CLS", (v) => (Number.isFinite(v) ? v.toFixed(3) : "")],
-    ["inp", "INP", fmtMs],
-  ]) {
+  for (const [metric, label, formatter] of WORST_METRICS) {
     console.log(`\n=== Worst ${label} Top5 ===`);
     for (const [u, v] of summary.worst[metric] || []) {
       console.log(`${formatter(v)}  ${u}`);
@@ -652,11 +1014,15 @@ async function main() {
   console.log(`  - 汇总报告（Markdown）: ${reportMdPath}`);
   console.log(`  - 表格（CSV）: ${csvPath}`);
   console.log(`  - 详细数据（JSON）: ${jsonPath}`);
-  console.log(`  - Lighthouse原始数据: ${path.join(outDir, "lhr")}`);
+  if (args.keepLhr) console.log(`  - Lighthouse原始数据: ${path.join(outDir, "lhr")}`);
   console.log(`\n💡 提示：可以直接用Excel或WPS打开 ${csvPath} 查看表格`);
 }
 
-main().catch((err) => {
-  console.error(err.message || err);
-  process.exit(1);
-});
+if (isMainThread) {
+  main().catch((err) => {
+    console.error(err.message || err);
+    process.exit(1);
+  });
+} else {
+  runParseWorker();
+}
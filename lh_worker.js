@@ -0,0 +1,39 @@
+#!/usr/bin/env node
+/* eslint-disable no-console */
+// Long-lived Lighthouse worker used by `lcp.js --persistent-workers`.
+// Lighthouse and chrome-launcher are loaded once per process; lcp.js then sends
+// `{ url }` messages over the IPC channel and gets back `{ lhr }` (the LHR JSON
+// as bytes) or `{ error }`, one URL at a time.
+const { chromeFlags, flags } = JSON.parse(process.argv[2] || "{}");
+
+let modules = null;
+function loadModules() {
+  if (!modules) {
+    // Both packages are ESM-only, hence dynamic import from this CommonJS file.
+    modules = Promise.all([import("lighthouse"), import("chrome-launcher")])
+      .then(([lh, launcher]) => ({ lighthouse: lh.default, launcher }));
+  }
+  return modules;
+}
+
+async function runOnce(url) {
+  const { lighthouse, launcher } = await loadModules();
+  const chrome = await launcher.launch({ chromeFlags });
+  try {
+    const result = await lighthouse(url, { ...flags, port: chrome.port });
+    if (!result || !result.lhr) throw new Error("Lighthouse returned no result");
+    return Buffer.from(JSON.stringify(result.lhr));
+  } finally {
+    await chrome.kill();
+  }
+}
+
+process.on("message", async ({ url }) => {
+  try {
+    process.send({ lhr: await runOnce(url) });
+  } catch (err) {
+    process.send({ error: err.message || String(err) });
+  }
+});
+
+process.on("disconnect", () => process.exit(0));